@@ -0,0 +1,41 @@
+import httpcore
+import httpx
+import logging
+from config import cfg
+
+log = logging.getLogger("raft.utils")
+
+# Shared async client used by followers to proxy client requests to the leader
+client = httpx.AsyncClient(
+    limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+    timeout=cfg.REQUESTS_TIMEOUT / 1000,
+    http2=True,
+)
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Bare connection pool underneath httpx, used for the heartbeat/update hot path
+_pool = httpcore.AsyncConnectionPool(max_connections=64, max_keepalive_connections=32)
+_FAST_EXTENSIONS = {"timeout": dict.fromkeys(("connect", "read", "write", "pool"), cfg.REQUESTS_TIMEOUT / 1000)}
+_FAST_ERRORS = (httpcore.TimeoutException, httpcore.NetworkError, httpcore.ProtocolError)
+
+
+async def send_url(url, body):
+    """
+    Send an already serialized JSON body to a precomputed URL straight through the connection
+    pool, skipping httpx's per-request setup (URL merging, cookies, auth, event hooks).
+
+    Args:
+        url (str): The full URL of the route (e.g., http://ip:port/heartbeat).
+        body (bytes): The serialized JSON payload.
+
+    Returns:
+        httpcore.Response or None: The response object if the request was successful, or None if the request failed.
+    """
+    try:
+        reply = await _pool.request("POST", url, headers=JSON_HEADERS, content=body, extensions=_FAST_EXTENSIONS)
+        if reply.status == 200:
+            return reply
+    except _FAST_ERRORS:
+        log.debug("[Utils] %s is unreachable.", url)
+    return None
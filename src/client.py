@@ -1,5 +1,14 @@
 import sys
 import requests
+from urllib.parse import urlsplit
+
+try:
+    import readline  # Command history and tab-completion in interactive mode
+except ImportError:  # Not available on Windows
+    readline = None
+
+# Reuse one session so repeated requests (and leader redirects) share pooled connections
+_session = requests.Session()
 
 def show_log(addr):
     """
@@ -10,7 +19,7 @@ def show_log(addr):
     """
     server_address = addr + "/show_log"
     try:
-        response = requests.get(server_address, timeout=1)
+        response = _session.get(server_address, timeout=1)
         if response.status_code == 200:
             print(f"Log of the node at {addr}:")
             log = response.json().get("log", [])
@@ -39,29 +48,31 @@ def redirect_to_leader(server_address, message):
         dict: The JSON response from the leader or an error message.
     """
     request_type = message["type"]
+    route = urlsplit(server_address).path  # Keep the same endpoint when following redirects
     while True:
         try:
             # Determine the type of request and send it to the server
             if request_type == "get":
-                response = requests.get(server_address, json=message, timeout=1)
+                response = _session.get(server_address, json=message, timeout=1)
             else:  # PUT request
-                response = requests.put(server_address, json=message, timeout=1)
+                response = _session.put(server_address, json=message, timeout=1)
         except Exception as e:
             print(f"Error communicating with {server_address}: {e}")
             return {"error": str(e)}
 
         # Check the response for redirection or successful handling
-        if response.status_code == 200 and "payload" in response.json():
-            payload = response.json()["payload"]
+        data = response.json()
+        if response.status_code == 200 and "payload" in data:
+            payload = data["payload"]
             if "message" in payload:  # Redirect to the leader
-                server_address = payload["message"] + "/request"
+                server_address = payload["message"] + route
                 print(f"Redirecting to leader at {server_address}")
             else:  # Successfully handled by the current node
                 break
         else:  # Unhandled error or unexpected response
             break
 
-    return response.json()
+    return data
 
 
 def put(addr, key, value):
@@ -79,6 +90,20 @@ def put(addr, key, value):
     print("PUT request result:", redirect_to_leader(server_address, message))
 
 
+def put_many(addr, pairs):
+    """
+    Sends a batched PUT request to store several key-value pairs in one replication round.
+
+    Args:
+        addr (str): The address of the initial server.
+        pairs (list): A list of (key, value) tuples to store.
+    """
+    server_address = addr + "/request_batch"
+    payload = [{'key': key, 'value': value} for key, value in pairs]
+    message = {"type": "put", "payload": payload}
+    print("PUT_MANY request result:", redirect_to_leader(server_address, message))
+
+
 def get(addr, key):
     """
     Sends a GET request to retrieve the value associated with a key in the Raft cluster.
@@ -104,7 +129,7 @@ def delete(addr, key):
     payload = {'key': key}
     message = {"type": "delete", "payload": payload}
     try:
-        response = requests.delete(server_address, json=message, timeout=1)
+        response = _session.delete(server_address, json=message, timeout=1)
         if response.status_code == 200:
             print(f"DELETE request result: {response.json()}")
         else:
@@ -113,6 +138,25 @@ def delete(addr, key):
         print(f"Error deleting key {key} from {addr}: {e}")
 
 
+# Interactive commands: name -> (argument count check, handler)
+COMMANDS = {
+    "get": (lambda argc: argc == 2, lambda addr, command: get(addr, command[1])),
+    "put": (lambda argc: argc == 3, lambda addr, command: put(addr, command[1], command[2])),
+    "put_many": (lambda argc: argc >= 3 and argc % 2 == 1,
+                 lambda addr, command: put_many(addr, list(zip(command[1::2], command[2::2])))),
+    "delete": (lambda argc: argc == 2, lambda addr, command: delete(addr, command[1])),
+    "show_log": (lambda argc: argc == 1, lambda addr, command: show_log(addr)),
+}
+
+
+def complete(text, state):
+    """
+    Readline completer for interactive command names.
+    """
+    matches = [name for name in [*COMMANDS, "exit"] if name.startswith(text)]
+    return matches[state] if state < len(matches) else None
+
+
 if __name__ == "__main__":
     """
     Entry point for the client script.
@@ -127,22 +171,21 @@ if __name__ == "__main__":
     if len(sys.argv) == 2:
         # Interactive mode
         addr = sys.argv[1]
+        if readline:
+            readline.set_completer(complete)
+            readline.parse_and_bind("tab: complete")
         while True:
-            command = input("Enter command (get <key> | put <key> <value> | delete <key> | show_log | exit): ").strip().split()
+            command = input("Enter command (get <key> | put <key> <value> | put_many <key> <value> ... | delete <key> | show_log | exit): ").strip().split()
             if not command:
                 continue
-            if command[0].lower() == "exit":
+            cmd = command[0].lower()
+            if cmd == "exit":
                 break
-            elif command[0].lower() == "get" and len(command) == 2:
-                get(addr, command[1])
-            elif command[0].lower() == "put" and len(command) == 3:
-                put(addr, command[1], command[2])
-            elif command[0].lower() == "delete" and len(command) == 2:
-                delete(addr, command[1])
-            elif command[0].lower() == "show_log" and len(command) == 1:
-                show_log(addr)
+            valid, handler = COMMANDS.get(cmd, (None, None))
+            if handler and valid(len(command)):
+                handler(addr, command)
             else:
-                print("Invalid command. Use 'get <key>', 'put <key> <value>', 'delete <key>', 'show_log', or 'exit'.")
+                print("Invalid command. Use 'get <key>', 'put <key> <value>', 'put_many <key> <value> ...', 'delete <key>', 'show_log', or 'exit'.")
     elif len(sys.argv) == 3:
         # Command-line mode: DELETE or GET request
         addr = sys.argv[1]
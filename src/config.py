@@ -5,4 +5,14 @@ class cfg():
 
     REQUESTS_TIMEOUT = 300
     HB_TIME = 3000
-    MAX_LOG_WAIT = 300
\ No newline at end of file
+    MAX_LOG_WAIT = 300
+    PROXY_TIMEOUT = 800
+
+    # Memory-mapped log storage
+    LOG_DIR = "raft_logs"
+    LOG_CAPACITY = 4096  # Records per log segment file
+    CATCHUP_MAX = 512  # Committed records sent per catch-up message to a lagging follower
+
+    # Leader-side PUT coalescing
+    BATCH_MAX = 64
+    BATCH_WINDOW = 1
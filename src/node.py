@@ -1,7 +1,17 @@
+import asyncio
+import itertools
+import logging
+import orjson
+import os
+import queue
 import threading
-import time
+from concurrent.futures import Future
 import utils as utils
+import async_utils
 from config import cfg
+from raft_log import RaftLog, decode_entries, read_snapshot
+
+log = logging.getLogger("raft.node")
 
 # Constants for node states
 FOLLOWER = 0
@@ -19,305 +29,535 @@ class Colors:
     BOLD = '\033[1m'
     UNDERLINE = '\033[4m'
 
+class ColorFormatter(logging.Formatter):
+    """
+    Logging formatter that colors each record by level for terminal output.
+    """
+    LEVEL_COLORS = {
+        logging.DEBUG: Colors.OKBLUE,
+        logging.INFO: Colors.OKGREEN,
+        logging.WARNING: Colors.WARNING,
+        logging.ERROR: Colors.FAIL,
+    }
+
+    def format(self, record):
+        color = self.LEVEL_COLORS.get(record.levelno, Colors.FAIL)
+        return f"{color}{super().format(record)}{Colors.ENDC}"
+
 class Node:
     """
     Represents a single node in a distributed system implementing Raft consensus algorithm.
     """
-    def __init__(self, fellow, my_ip):
+    def __init__(self, fellow, my_ip, loop):
         """
-        Initialize a Node with its fellow nodes and IP address.
+        Initialize a Node with its fellow nodes, IP address and the server's event loop.
         """
         self.addr = my_ip  # Node's IP address
         self.fellow = fellow  # List of other nodes in the cluster
-        self.lock = threading.Lock()  # Lock for handling staged data
-        self.DB = {}  # Simulated database
-        self.log = []  # Log entries for Raft
-        self.staged = None  # Staged log entry
+        self._urls = {peer: {route: f"{peer}/{route}" for route in ("heartbeat", "vote_req")} for peer in fellow}  # Peer RPC URLs
+        self._round_lock = threading.Lock()  # Keeps one log replication round in flight at a time
+        self._staged_lock = threading.Lock()  # Guards staged and commitIdx
+        self._db_lock = threading.Lock()  # Guards raft_log (appends, rotation and reads)
+        self._ack_cv = threading.Condition()  # Signaled whenever a follower confirms a log update
+        self._ack_count = 0  # Follower confirmations for the log update in flight
+        self._ack_round = 0  # Sequence number of the log update in flight; stale confirmations are ignored
+        os.makedirs(cfg.LOG_DIR, exist_ok=True)
+        log_name = my_ip.split("//")[-1].replace(":", "_") + ".log"
+        self.raft_log = RaftLog(os.path.join(cfg.LOG_DIR, log_name), cfg.LOG_CAPACITY)  # Committed entries, also serving reads
+        self.staged = None  # Staged batch of log entries
+        self._staged_base = 0  # Commit index the staged batch follows; its entries start at _staged_base + 1
+        self._staged_id = None  # [term, round] identifying the staged batch
+        self._committed_id = None  # [term, round] of the latest batch committed by this node
         self.term = 0  # Current term of the node
         self.status = FOLLOWER  # Initial state of the node
         self.voteCount = 0  # Count of votes received
-        self.commitIdx = 0  # Index of the latest committed log entry
-        self.timeout_thread = None  # Thread for handling timeout
+        self.commitIdx = self.raft_log.last()[1]  # Index of the latest committed log entry, restored from disk
+        self._timeout_handle = None  # Pending election timer on the event loop
+        self._election_task = None  # Election started by the most recent timeout
+        self._vote_task = None  # Vote request round of the current election
+        self._hb_task = None  # Heartbeat round currently in flight
+        self._hb_body_cache = (None, None)  # ((term, commitIdx, committed id), serialized heartbeat body) reused until any changes
         self.majority = len(self.fellow) // 2 + 1  # Majority needed for consensus
         self.leader = None  # Current leader's address
+        self.leader_request_url = None  # Cached "/request" URL of the current leader for forwarding
+        self.leader_batch_url = None  # Cached "/request_batch" URL of the current leader for forwarding
+        self._loop = loop  # Server event loop driving RPC fan-out to fellow nodes
+        self._state_lock = asyncio.Lock()  # Serializes term/status transitions on the event loop
+        self._pending = []  # Queued (payload, Future) PUTs waiting to be batched
+        self._pending_cv = threading.Condition()  # Guards _pending and wakes the batcher
+        threading.Thread(target=self.batch_loop, daemon=True).start()
+        self._apply_queue = queue.Queue()  # Committed batches waiting to be applied to the log
+        threading.Thread(target=self.apply_loop, daemon=True).start()
         self.init_timeout()  # Initialize election timeout
-        print(f"{Colors.OKBLUE}[Node {self.addr}] Initialized as FOLLOWER.{Colors.ENDC}")
+        log.info("[Node %s] Initialized as FOLLOWER.", self.addr)
 
     def incrementVote(self):
         """
         Increment the vote count and check if the node has received a majority to become LEADER.
         """
         self.voteCount += 1
-        print(f"{Colors.OKBLUE}[Node {self.addr}] Received vote. Total votes: {self.voteCount}/{self.majority} (Term {self.term}).{Colors.ENDC}")
+        log.debug("[Node %s] Received vote. Total votes: %s/%s (Term %s).", self.addr, self.voteCount, self.majority, self.term)
         if self.voteCount >= self.majority:
-            print(f"{Colors.OKGREEN}[Node {self.addr}] Elected as LEADER for Term {self.term}.{Colors.ENDC}")
+            log.info("[Node %s] Elected as LEADER for Term %s.", self.addr, self.term)
             self.status = LEADER
             self.leader = self.addr
+            self.leader_request_url = None
+            self.leader_batch_url = None
             self.startHeartBeat()
 
-    def startElection(self):
+    async def startElection(self):
         """
         Transition the node to CANDIDATE state and start a new election.
         Dynamically calculate the majority based on active nodes.
         """
-        self.term += 1  # Increment term for the new election
-        self.voteCount = 1  # Start with self-vote
-        self.status = CANDIDATE
-        self.leader = None
-        self.majority = (len(self.fellow) + 1) // 2 + 1  # Calculate majority based on total nodes
-        print(f"{Colors.WARNING}[Node {self.addr}] Starting election for Term {self.term}. Current Leader: None.{Colors.ENDC}")
-        self.init_timeout()
-        self.send_vote_req()
+        async with self._state_lock:
+            self.term += 1  # Increment term for the new election
+            self.voteCount = 1  # Start with self-vote
+            self.status = CANDIDATE
+            self.leader = None
+            self.leader_request_url = None
+            self.leader_batch_url = None
+            self.majority = (len(self.fellow) + 1) // 2 + 1  # Calculate majority based on total nodes
+            log.info("[Node %s] Starting election for Term %s. Current Leader: None.", self.addr, self.term)
+            self.init_timeout()
+            self.send_vote_req()
 
 
-    def check_majority(self):
+    def send_vote_req(self):
         """
-        Check the majority dynamically based on reachable peers and update the majority threshold.
+        Request votes from fellow nodes for the current election term.
+        Dynamically count votes only from responding peers. Called on the event loop.
         """
-        active_peers = [peer for peer in self.fellow if utils.send(peer, "heartbeat", {"term": self.term})]
-        self.majority = (len(active_peers) + 1) // 2 + 1  # Include self in the majority calculation
-        print(f"{Colors.OKBLUE}[Node {self.addr}] Updated majority: {self.majority} based on active peers ({len(active_peers) + 1} total active nodes).{Colors.ENDC}")
+        log.debug("[Node %s] Requesting votes from fellow nodes for Term %s.", self.addr, self.term)
+        self._vote_task = self._loop.create_task(self._vote_round(self.term))
 
-    def send_vote_req(self):
+    async def _vote_round(self, term):
         """
-        Request votes from fellow nodes for the current election term.
-        Dynamically count votes only from responding peers.
+        Ask every fellow node for its vote concurrently.
         """
-        print(f"{Colors.OKBLUE}[Node {self.addr}] Requesting votes from fellow nodes for Term {self.term}.{Colors.ENDC}")
-        for voter in self.fellow:
-            threading.Thread(target=self.ask_for_vote, args=(voter, self.term)).start()
+        await asyncio.gather(*[self.ask_for_vote(voter, term) for voter in self.fellow])
 
-    def ask_for_vote(self, voter, term):
+    async def ask_for_vote(self, voter, term):
         """
-        Send a vote request to a specific node and handle its response.
+        Send a single vote request to a specific node and handle its response.
+        An unreachable voter is not retried; the next election timeout starts a new round instead.
         """
         message = {"term": term, "commitIdx": self.commitIdx, "staged": self.staged}
-        route = "vote_req"
-        while self.status == CANDIDATE and self.term == term:
-            reply = utils.send(voter, route, message)
-            if reply:
-                choice = reply.json()["choice"]
-                if choice and self.status == CANDIDATE:
-                    print(f"{Colors.OKGREEN}[Node {self.addr}] Vote received from {voter} for Term {term}.{Colors.ENDC}")
-                    self.incrementVote()
-                elif not choice:
-                    term = reply.json()["term"]
-                    if term > self.term:
-                        print(f"{Colors.FAIL}[Node {self.addr}] Detected higher Term {term} from {voter}. Stepping down to FOLLOWER.{Colors.ENDC}")
-                        self.term = term
-                        self.status = FOLLOWER
-                break
-            else:
-                print(f"{Colors.FAIL}[Node {self.addr}] No response from {voter} for Term {term}.{Colors.ENDC}")
-
+        reply = await async_utils.send_url(self._urls[voter]["vote_req"], orjson.dumps(message))
+        if not reply:
+            log.debug("[Node %s] No response from %s for Term %s.", self.addr, voter, term)
+            return
 
-    def decide_vote(self, term, commitIdx, staged):
+        async with self._state_lock:
+            r = orjson.loads(reply.content)
+            choice = r["choice"]
+            if choice and self.status == CANDIDATE and self.term == term:
+                log.debug("[Node %s] Vote received from %s for Term %s.", self.addr, voter, term)
+                self.incrementVote()
+            elif not choice:
+                term = r["term"]
+                if term > self.term:
+                    log.info("[Node %s] Detected higher Term %s from %s. Stepping down to FOLLOWER.", self.addr, term, voter)
+                    self.term = term
+                    self.status = FOLLOWER
+
+    async def decide_vote(self, term, commitIdx, staged):
         """
         Decide whether to vote for a candidate based on its term and log state.
         """
-        if self.term < term and self.commitIdx <= commitIdx and (staged or (self.staged == staged)):
-            self.reset_timeout()
-            self.term = term
-            print(f"{Colors.OKGREEN}[Node {self.addr}] Voting for Term {term}.{Colors.ENDC}")
-            return True, self.term
-        else:
-            print(f"{Colors.FAIL}[Node {self.addr}] Vote denied for Term {term}. Current Term: {self.term}.{Colors.ENDC}")
-            return False, self.term
+        async with self._state_lock:
+            if self.term < term and self.commitIdx <= commitIdx and (staged or (self.staged == staged)):
+                self.reset_timeout()
+                self.term = term
+                log.info("[Node %s] Voting for Term %s.", self.addr, term)
+                return True, self.term
+            else:
+                log.debug("[Node %s] Vote denied for Term %s. Current Term: %s.", self.addr, term, self.term)
+                return False, self.term
 
     def startHeartBeat(self):
         """
         Begin sending periodic heartbeat messages to maintain leadership.
         """
-        print(f"{Colors.OKGREEN}[Node {self.addr}] Sending heartbeats as LEADER for Term {self.term}.{Colors.ENDC}")
+        log.info("[Node %s] Sending heartbeats as LEADER for Term %s.", self.addr, self.term)
         if self.staged:
-            self.handle_put(self.staged)
+            # handle_put_batch blocks until followers ack, so keep it off the event loop
+            threading.Thread(target=self.handle_put_batch, args=(self.staged,)).start()
 
-        for each in self.fellow:
-            t = threading.Thread(target=self.send_heartbeat, args=(each,))
-            t.start()
+        self._loop.call_soon_threadsafe(self._schedule_hb, self.term)
 
-    def send_heartbeat(self, follower):
+    def _schedule_hb(self, term):
         """
-        Send a heartbeat message to a follower node and handle its response.
+        Start a round of heartbeats and schedule the next one HB_TIME ms later,
+        for as long as this node is LEADER for `term`.
         """
-        route = "heartbeat"
-        message = {"term": self.term, "addr": self.addr}
-        while self.status == LEADER:
-            start = time.time()
-            reply = utils.send(follower, route, message)
-            if reply:
-                print(f"{Colors.OKGREEN}[Node {self.addr}] Heartbeat acknowledged by {follower}.{Colors.ENDC}")
-                self.heartbeat_reply_handler(reply.json()["term"], reply.json()["commitIdx"])
-            else:
-                print(f"{Colors.FAIL}[Node {self.addr}] No response from {follower} during heartbeat.{Colors.ENDC}")
-            delta = time.time() - start
-            time.sleep((cfg.HB_TIME - delta) / 1000)
+        if self.status != LEADER or self.term != term:
+            return
+        self._hb_task = self._loop.create_task(self._beat_round())
+        self._loop.call_later(cfg.HB_TIME / 1000, self._schedule_hb, term)
 
-    def heartbeat_reply_handler(self, term, commitIdx):
+    async def _beat_round(self):
         """
-        Handle the reply to a heartbeat and update node state if necessary.
+        Send one heartbeat to every follower concurrently.
         """
-        if term > self.term:
-            print(f"{Colors.FAIL}[Node {self.addr}] Higher Term {term} detected. Stepping down to FOLLOWER.{Colors.ENDC}")
-            self.term = term
-            self.status = FOLLOWER
-            self.init_timeout()
+        body = self._hb_body()
+        commit_idx = self._hb_body_cache[0][1]  # Commit index carried by this body
+        await asyncio.gather(*[self.send_heartbeat(follower, body, commit_idx) for follower in self.fellow])
 
-    def reset_timeout(self):
+    def _hb_body(self):
         """
-        Reset the election timeout with a new random value.
+        Return the serialized heartbeat body, rebuilding it only when the term or latest commit has changed.
+        Heartbeats carry the commit index and the id of the latest committed batch so followers can commit their staged batch.
         """
-        self.election_time = time.time() + utils.random_timeout()
-        print(f"{Colors.OKBLUE}[Node {self.addr}] Timeout reset. Next timeout at {self.election_time}.{Colors.ENDC}")
+        seen, body = self._hb_body_cache
+        key = (self.term, self.commitIdx, self._committed_id)
+        if seen != key:
+            body = orjson.dumps({"term": self.term, "addr": self.addr, "commitIdx": self.commitIdx, "committedBatch": self._committed_id})
+            self._hb_body_cache = (key, body)
+        return body
 
-    def heartbeat_follower(self, msg):
+    async def send_heartbeat(self, follower, body, commit_idx):
         """
-        Handle a heartbeat message from the current leader.
+        Send a pre-serialized heartbeat message to a follower node and handle its response.
+        A follower that replies with a commit index behind `commit_idx` is caught up from the log.
         """
-        term = msg["term"]
-        if self.term <= term:
-            self.leader = msg["addr"]
-            self.reset_timeout()
+        reply = await async_utils.send_url(self._urls[follower]["heartbeat"], body)
+        if reply:
+            log.debug("[Node %s] Heartbeat acknowledged by %s.", self.addr, follower)
+            r = orjson.loads(reply.content)
+            await self.heartbeat_reply_handler(r["term"], r["commitIdx"])
+            if self.status == LEADER and r["term"] == self.term and r["commitIdx"] < commit_idx:
+                await self._catch_up(follower, r["term"], r["commitIdx"], commit_idx)
+        else:
+            log.debug("[Node %s] No response from %s during heartbeat.", self.addr, follower)
 
-            if self.status == CANDIDATE:
-                print(f"{Colors.WARNING}[Node {self.addr}] Stepping down to FOLLOWER after receiving heartbeat from Leader {self.leader} (Term {term}).{Colors.ENDC}")
-                self.status = FOLLOWER
-            elif self.status == LEADER:
-                print(f"{Colors.FAIL}[Node {self.addr}] Stepping down to FOLLOWER as higher Term {term} detected.{Colors.ENDC}")
+    async def heartbeat_reply_handler(self, term, commitIdx):
+        """
+        Handle the reply to a heartbeat and update node state if necessary.
+        """
+        async with self._state_lock:
+            if term > self.term:
+                log.info("[Node %s] Higher Term %s detected. Stepping down to FOLLOWER.", self.addr, term)
+                self.term = term
                 self.status = FOLLOWER
                 self.init_timeout()
 
-            if self.term < term:
-                self.term = term
-
-            if "action" in msg:
-                action = msg["action"]
-                if action == "log":
-                    payload = msg["payload"]
-                    self.staged = payload
-                elif self.commitIdx <= msg["commitIdx"]:
-                    if not self.staged:
-                        self.staged = msg["payload"]
-                    self.commit()
+    def reset_timeout(self):
+        """
+        Reset the election timeout with a new random value.
+        A pending election timer is moved to the new deadline right away.
+        """
+        self.election_time = self._loop.time() + utils.random_timeout()
+        if self._timeout_handle is not None:
+            self._timeout_handle.cancel()
+            self._timeout_handle = self._loop.call_at(self.election_time, self._on_timeout)
+        log.debug("[Node %s] Timeout reset. Next timeout at %s.", self.addr, self.election_time)
 
-        return self.term, self.commitIdx
+    async def heartbeat_follower(self, msg):
+        """
+        Handle a heartbeat message from the current leader.
+        """
+        async with self._state_lock:
+            term = msg["term"]
+            if self.term <= term:
+                if self.leader != msg["addr"]:
+                    self.leader = msg["addr"]
+                    self.leader_request_url = self.leader + "/request"
+                    self.leader_batch_url = self.leader + "/request_batch"
+                self.reset_timeout()
+
+                if self.status == CANDIDATE:
+                    log.info("[Node %s] Stepping down to FOLLOWER after receiving heartbeat from Leader %s (Term %s).", self.addr, self.leader, term)
+                    self.status = FOLLOWER
+                elif self.status == LEADER:
+                    log.info("[Node %s] Stepping down to FOLLOWER as higher Term %s detected.", self.addr, term)
+                    self.status = FOLLOWER
+                    self.init_timeout()
+
+                if self.term < term:
+                    self.term = term
+
+                with self._staged_lock:
+                    # Commit advancement rides on every message from the leader; the staged batch is
+                    # committed only if it directly follows our log and is the very batch the leader committed
+                    if (self.staged and self._staged_base == self.commitIdx and self._staged_id == msg.get("committedBatch")
+                            and self.commitIdx + len(self.staged) <= msg["commitIdx"]):
+                        self.commit()
+
+                    if msg.get("action") == "log":
+                        # The payload is the whole batch of entries replicated in this round,
+                        # following the leader's log at its commitIdx
+                        if msg["commitIdx"] != self.commitIdx:
+                            # A missed update left a gap; our commitIdx in the reply tells the leader not to count us
+                            log.warning("[Node %s] Ignoring log update at index %s; local commit index is %s.", self.addr, msg["commitIdx"], self.commitIdx)
+                        elif self.staged and self._staged_base == self.commitIdx and msg["batch"] < self._staged_id:
+                            # A retried round's update arriving after the one that replaced it
+                            log.debug("[Node %s] Ignoring stale log update %s; staged batch is %s.", self.addr, msg["batch"], self._staged_id)
+                        else:
+                            self.staged = msg["payload"]
+                            self._staged_base = msg["commitIdx"]
+                            self._staged_id = msg["batch"]
+                    elif msg.get("action") == "catchup":
+                        self.catch_up(msg["entries"])
+
+            return self.term, self.commitIdx
+
+    async def step_down(self):
+        """
+        Return to FOLLOWER state and restart the election timeout.
+        """
+        async with self._state_lock:
+            self.status = FOLLOWER
+            self.init_timeout()
 
     def init_timeout(self):
         """
-        Start or restart the timeout thread for handling elections.
+        Reset the election timeout and arm the election timer if it is not already pending.
         """
         self.reset_timeout()
-        if self.timeout_thread and self.timeout_thread.is_alive():
-            return
-        self.timeout_thread = threading.Thread(target=self.timeout_loop)
-        self.timeout_thread.start()
+        if self._timeout_handle is None:
+            self._timeout_handle = self._loop.call_at(self.election_time, self._on_timeout)
 
-    def timeout_loop(self):
+    def _on_timeout(self):
         """
-        Wait for the timeout period and trigger a new election if necessary.
+        Fire when the election timer expires and trigger a new election if necessary.
         """
-        while self.status != LEADER:
-            delta = self.election_time - time.time()
-            if delta < 0:
-                print(f"{Colors.WARNING}[Node {self.addr}] Timeout reached. Starting a new election for Term {self.term + 1}.{Colors.ENDC}")
-                self.startElection()
-            else:
-                time.sleep(delta)
-
-        if self.status == CANDIDATE and self.voteCount < self.majority:
-            print(f"{Colors.FAIL}[Node {self.addr}] Election failed. Retrying...{Colors.ENDC}")
-            self.startElection()
+        self._timeout_handle = None
+        if self.status == LEADER:
+            return
+        if self.status == CANDIDATE:
+            log.warning("[Node %s] Election failed. Retrying...", self.addr)
+        else:
+            log.info("[Node %s] Timeout reached. Starting a new election for Term %s.", self.addr, self.term + 1)
+        self._election_task = self._loop.create_task(self.startElection())
 
     def handle_get(self, payload):
         """
         Handle a GET request for a specific key in the database.
         """
-        key = payload["key"]
-        if key in self.DB:
-            payload["value"] = self.DB[key]
+        with self._db_lock:
+            value = self.raft_log.get(payload["key"])
+        if value is not None:
+            payload["value"] = value
             return payload
         else:
             return None
 
-    def check_majority(self):
-        """
-        Check the majority based on active peers and update the majority threshold.
-        """
-        active_peers = [peer for peer in self.fellow if utils.send(peer, "heartbeat", {"term": self.term})]
-        self.majority = ((len(active_peers) + 1) // 2) + 1
-        print(f"{Colors.OKBLUE}[Node {self.addr}] Updated majority: {self.majority} based on active peers.{Colors.ENDC}")
-
-    def spread_update(self, message, confirmations=None, lock=None):
-        """
-        Send a message to all fellow nodes and collect confirmations.
-        """
-        for i, each in enumerate(self.fellow):
-            r = utils.send(each, "heartbeat", message)
-            if r and confirmations:
-                confirmations[i] = True
-        if lock:
-            lock.release()
-
-    def handle_put(self, payload):
-        """
-        Handle a PUT request to stage, commit, and replicate a log entry.
-        """
-        print(f"{Colors.OKBLUE}[Node {self.addr}] Handling PUT request: {payload}{Colors.ENDC}")
-        self.lock.acquire()
-        self.staged = payload
-        waited = 0
-        log_message = {
-            "term": self.term,
-            "addr": self.addr,
-            "payload": payload,
-            "action": "log",
-            "commitIdx": self.commitIdx
-        }
-
-        log_confirmations = [False] * len(self.fellow)
-        threading.Thread(target=self.spread_update, args=(log_message, log_confirmations)).start()
-        while sum(log_confirmations) + 1 < self.majority:
-            waited += 0.0005
-            time.sleep(0.0005)
-            if waited > cfg.MAX_LOG_WAIT / 1000:
-                print(f"{Colors.FAIL}[Node {self.addr}] Log update rejected after waiting {cfg.MAX_LOG_WAIT} ms.{Colors.ENDC}")
-                self.lock.release()
+    async def spread_update(self, message, ack_round=None):
+        """
+        Send a message to all fellow nodes concurrently and, if `ack_round` is given, count their
+        confirmations towards that log update.
+        """
+        body = orjson.dumps(message)
+        await asyncio.gather(*[self._push_update(each, body, ack_round, message["term"], message.get("commitIdx")) for each in self.fellow])
+
+    async def _push_update(self, follower, body, ack_round, term, base):
+        """
+        Send a serialized update to a single follower and signal its confirmation as soon as it arrives.
+        A follower confirms a log update only by replying with our term and the commit index the batch follows.
+        """
+        r = await async_utils.send_url(self._urls[follower]["heartbeat"], body)
+        if r and ack_round is not None:
+            reply = orjson.loads(r.content)
+            if reply["term"] == term and reply["commitIdx"] < base and ack_round == self._ack_round:
+                # The follower missed earlier updates: send it the committed records, then this update again
+                if await self._catch_up(follower, term, reply["commitIdx"], base):
+                    r = await async_utils.send_url(self._urls[follower]["heartbeat"], body)
+                    if not r:
+                        return
+                    reply = orjson.loads(r.content)
+            if reply["term"] != term or reply["commitIdx"] != base:
+                log.debug("[Node %s] %s did not stage the log update at index %s (at %s, Term %s).", self.addr, follower, base, reply["commitIdx"], reply["term"])
+                return
+            with self._ack_cv:
+                if ack_round == self._ack_round:
+                    self._ack_count += 1
+                    self._ack_cv.notify()
+
+    async def _catch_up(self, follower, term, follower_idx, target):
+        """
+        Send a lagging follower the committed records after `follower_idx`, up to `target`, in
+        messages of at most CATCHUP_MAX records.
+
+        Returns:
+            bool: True if the follower confirmed it reached `target`, False otherwise.
+        """
+        log.debug("[Node %s] Catching up %s from index %s to %s.", self.addr, follower, follower_idx, target)
+        while follower_idx < target:
+            stop = min(target, follower_idx + cfg.CATCHUP_MAX) + 1
+            with self._db_lock:
+                raw = self.raft_log.read_range(follower_idx + 1, stop)
+            if not raw:
+                # Not applied to our own log yet; the next heartbeat retries
+                return False
+            message = {
+                "term": term,
+                "addr": self.addr,
+                "action": "catchup",
+                "entries": list(decode_entries(raw)),
+                "commitIdx": self.commitIdx,
+                "committedBatch": self._committed_id
+            }
+            r = await async_utils.send_url(self._urls[follower]["heartbeat"], orjson.dumps(message))
+            if not r:
                 return False
+            reply = orjson.loads(r.content)
+            if reply["term"] != term or reply["commitIdx"] <= follower_idx:
+                return False
+            follower_idx = reply["commitIdx"]
+        return True
 
-        commit_message = {
-            "term": self.term,
-            "addr": self.addr,
-            "payload": payload,
-            "action": "commit",
-            "commitIdx": self.commitIdx
-        }
-        self.commit()
-        threading.Thread(target=self.spread_update, args=(commit_message, None, self.lock)).start()
-        print(f"{Colors.OKGREEN}[Node {self.addr}] Log entry committed and replicated to majority.{Colors.ENDC}")
+    def submit_put(self, payload):
+        """
+        Queue a PUT request to be replicated with the next batch.
+
+        Returns:
+            concurrent.futures.Future: Resolves to True once the batch containing the entry is committed, False otherwise.
+        """
+        future = Future()
+        if not RaftLog.fits(payload["key"], payload["value"]):
+            log.warning("[Node %s] Rejected PUT that does not fit in a log record: %s", self.addr, payload)
+            future.set_result(False)
+            return future
+        with self._pending_cv:
+            self._pending.append((payload, future))
+            self._pending_cv.notify()
+        return future
+
+    def batch_loop(self):
+        """
+        Coalesce queued PUTs that arrive within BATCH_WINDOW ms (or until BATCH_MAX accumulate)
+        and replicate them in a single round.
+        """
+        while True:
+            with self._pending_cv:
+                self._pending_cv.wait_for(lambda: self._pending)
+                self._pending_cv.wait_for(lambda: len(self._pending) >= cfg.BATCH_MAX, timeout=cfg.BATCH_WINDOW / 1000)
+                batch = self._pending[:cfg.BATCH_MAX]
+                del self._pending[:cfg.BATCH_MAX]
+
+            result = False
+            if self.status == LEADER:
+                result = self.handle_put_batch([payload for payload, _ in batch])
+            for _, future in batch:
+                future.set_result(result)
+
+    def handle_put_batch(self, payloads):
+        """
+        Handle a batch of PUT requests: stage and replicate them as one log update, then commit locally.
+        Followers learn about the commit from the commitIdx carried by the next heartbeat or log update.
+        """
+        log.debug("[Node %s] Handling PUT batch of %s entries: %s", self.addr, len(payloads), payloads)
+        if not all(RaftLog.fits(payload["key"], payload["value"]) for payload in payloads):
+            log.warning("[Node %s] Rejected PUT batch with an entry that does not fit in a log record.", self.addr)
+            return False
+        with self._round_lock:
+            with self._ack_cv:
+                self._ack_round += 1
+                self._ack_count = 0
+                ack_round = self._ack_round
+            with self._staged_lock:
+                self.staged = payloads
+                self._staged_base = self.commitIdx
+                self._staged_id = [self.term, ack_round]
+                log_message = {
+                    "term": self.term,
+                    "addr": self.addr,
+                    "payload": payloads,
+                    "action": "log",
+                    "batch": self._staged_id,
+                    "commitIdx": self.commitIdx,
+                    "committedBatch": self._committed_id
+                }
+
+            asyncio.run_coroutine_threadsafe(self.spread_update(log_message, ack_round), self._loop)
+            with self._ack_cv:
+                acked = self._ack_cv.wait_for(lambda: self._ack_count + 1 >= self.majority, timeout=cfg.MAX_LOG_WAIT / 1000)
+            if not acked:
+                log.warning("[Node %s] Log update rejected after waiting %s ms.", self.addr, cfg.MAX_LOG_WAIT)
+                return False
+
+            with self._staged_lock:
+                if self.staged is not payloads:
+                    # Stepped down mid-round and a new leader replaced the staged batch
+                    log.warning("[Node %s] Staged batch was replaced before it could be committed.", self.addr)
+                    return False
+                self.commit()
+        log.debug("[Node %s] Log entry committed after replication to majority.", self.addr)
         return True
 
+    def apply_loop(self):
+        """
+        Apply committed batches to the log in order and flush each batch to disk.
+        A single thread keeps entries in log order.
+        """
+        while True:
+            index, term, entries = self._apply_queue.get()
+            with self._db_lock:
+                for idx, entry in enumerate(entries, start=index):
+                    self.raft_log.append(term, idx, entry["key"], entry["value"])
+                self.raft_log.flush()
+            for idx, entry in enumerate(entries, start=index):
+                log.debug("[Node %s] Applied log entry %s: %s -> %s (Term %s).", self.addr, idx, entry["key"], entry["value"], term)
+
     def commit(self):
         """
-        Commit a staged log entry to the log and update the database.
+        Commit the staged batch: advance the commit index and hand the entries to the apply thread.
+        Callers must hold `_staged_lock`.
         """
-        self.commitIdx += 1
-        self.log.append(self.staged)
-        key = self.staged["key"]
-        value = self.staged["value"]
-        self.DB[key] = value
+        self._apply_queue.put((self.commitIdx + 1, self.term, self.staged))
+        self.commitIdx += len(self.staged)
+        self._committed_id = self._staged_id
+        self.staged = None
+
+    def catch_up(self, entries):
+        """
+        Commit records the leader sent after this node missed log updates, skipping any it already has.
+        Callers must hold `_staged_lock`.
+        """
+        entries = [entry for entry in entries if entry["index"] > self.commitIdx]
+        if not entries or entries[0]["index"] != self.commitIdx + 1:
+            return
+        for term, run in itertools.groupby(entries, key=lambda entry: entry["term"]):
+            run = list(run)
+            self._apply_queue.put((self.commitIdx + 1, term, run))
+            self.commitIdx += len(run)
+        log.info("[Node %s] Caught up to log index %s.", self.addr, self.commitIdx)
+        # Anything staged followed an older commit index
         self.staged = None
-        print(f"{Colors.OKGREEN}[Node {self.addr}] Committed log entry: {key} -> {value} (Term {self.term}).{Colors.ENDC}")
+        self._committed_id = None
+
+    def log_snapshot(self):
+        """
+        Take a consistent snapshot of the log. Only the active segment is copied under the lock,
+        so applies are not held off by the size of the history.
+
+        Returns:
+            tuple: The snapshot; read it with `read_snapshot` and decode the chunks with `decode_entries`.
+        """
+        with self._db_lock:
+            return self.raft_log.snapshot()
+
+    def log_entries(self):
+        """
+        Decode a snapshot of the committed log.
+
+        Returns:
+            list: The committed log entries in order, decoded as dictionaries.
+        """
+        return [entry for raw in read_snapshot(self.log_snapshot()) for entry in decode_entries(raw)]
 
     def show_log(self):
         """
         Outputs the current log of the node in a readable format.
         """
-        if self.log:
-            print(f"{Colors.HEADER}[Node {self.addr}] Current Log:{Colors.ENDC}")
-            for idx, entry in enumerate(self.log):
-                print(f"  {Colors.OKBLUE}Log Index {idx}: {entry}{Colors.ENDC}")
+        entries = self.log_entries()
+        if entries:
+            log.info("[Node %s] Current Log:", self.addr)
+            for idx, entry in enumerate(entries):
+                log.info("  Log Index %s: %s", idx, entry)
         else:
-            print(f"{Colors.WARNING}[Node {self.addr}] Log is empty.{Colors.ENDC}")
+            log.info("[Node %s] Log is empty.", self.addr)
 
     def handle_delete(self, payload):
         """
@@ -330,10 +570,11 @@ class Node:
             bool: True if the key was deleted successfully, False otherwise.
         """
         key = payload["key"]
-        if key in self.DB:
-            del self.DB[key]
-            print(f"{Colors.OKGREEN}[Node {self.addr}] Deleted key: {key}.{Colors.ENDC}")
+        with self._db_lock:
+            deleted = self.raft_log.delete(key)
+        if deleted:
+            log.debug("[Node %s] Deleted key: %s.", self.addr, key)
             return True
         else:
-            print(f"{Colors.FAIL}[Node {self.addr}] Key not found: {key}.{Colors.ENDC}")
+            log.debug("[Node %s] Key not found: %s.", self.addr, key)
             return False
\ No newline at end of file
@@ -0,0 +1,230 @@
+import mmap
+import os
+import struct
+
+# Fixed-size record layout: term, log index, key (16 bytes), value (64 bytes)
+RECORD = struct.Struct('<QQ16s64s')
+RECORD_SIZE = RECORD.size
+KEY_SIZE = 16
+VALUE_SIZE = 64
+
+
+def decode_entries(raw):
+    """
+    Decode raw log records into dictionaries, in log order.
+    """
+    for term, idx, key, value in RECORD.iter_unpack(raw):
+        yield {
+            "term": term,
+            "index": idx,
+            "key": key.rstrip(b'\0').decode(),
+            "value": value.rstrip(b'\0').decode(),
+        }
+
+
+class RaftLog:
+    """
+    Append-only log of committed entries stored as fixed-size records in segment files.
+
+    Only the active segment is memory-mapped; full segments are sealed, unmapped and read back
+    from disk, so open file descriptors stay bounded as the log grows. An in-memory index maps
+    each key to the segment and offset of its latest record, so the log doubles as the key-value
+    store without keeping a second copy of the values. Segments left by a previous run are
+    reopened, so a restarted node keeps its committed entries.
+    """
+    def __init__(self, path, capacity):
+        """
+        Open the log whose segments are named `path`.0, `path`.1, ..., each holding up to `capacity` records.
+        """
+        self.path = path
+        self.capacity = capacity  # Number of records a new segment can hold
+        self._sealed = []  # (path, record count) of every full segment, oldest first
+        self._buf = None  # Mapping of the active segment, which takes appends
+        self._count = 0  # Number of records written to the active segment
+        self._total = 0  # Number of records written across all segments
+        self._last = (0, 0)  # (term, index) of the latest record
+        self._index = {}  # Encoded key -> (segment number, offset) of its latest record
+
+        segments = 0
+        while os.path.exists(self._segment_path(segments)):
+            segments += 1
+        for segment in range(segments - 1):
+            self._load_sealed(segment)
+        if segments:
+            self._map_active('r+b')
+        else:
+            self._map_active('w+b')
+
+    @staticmethod
+    def fits(key, value):
+        """
+        Check whether a key-value pair fits in a single record.
+
+        Returns:
+            bool: True if both the encoded key and value are within the record limits.
+        """
+        return len(str(key).encode()) <= KEY_SIZE and len(str(value).encode()) <= VALUE_SIZE
+
+    def __len__(self):
+        return self._total
+
+    def last(self):
+        """
+        Returns:
+            tuple: The (term, index) of the latest record, or (0, 0) if the log is empty.
+        """
+        return self._last
+
+    def append(self, term, idx, key, value):
+        """
+        Append a committed entry to the log and point the key's index entry at it.
+
+        Raises:
+            ValueError: If the key or value does not fit in a record.
+        """
+        if not self.fits(key, value):
+            raise ValueError(f"Entry {key!r} exceeds the {KEY_SIZE}/{VALUE_SIZE} byte key/value limit.")
+        if self._count == len(self._buf) // RECORD_SIZE:
+            self._rotate()
+        encoded_key = str(key).encode()
+        offset = self._count * RECORD_SIZE
+        RECORD.pack_into(self._buf, offset, term, idx, encoded_key, str(value).encode())
+        self._index[encoded_key] = (len(self._sealed), offset)
+        self._count += 1
+        self._total += 1
+        self._last = (term, idx)
+
+    def flush(self):
+        """
+        Write the active segment's appended records through to disk (msync).
+        """
+        self._buf.flush()
+
+    def get(self, key):
+        """
+        Read the latest value stored for a key.
+
+        Returns:
+            str or None: The value, or None if the key is not present.
+        """
+        location = self._index.get(str(key).encode())
+        if location is None:
+            return None
+        segment, offset = location
+        if segment == len(self._sealed):
+            record = self._buf[offset:offset + RECORD_SIZE]
+        else:
+            with open(self._sealed[segment][0], 'rb') as f:
+                f.seek(offset)
+                record = f.read(RECORD_SIZE)
+        return RECORD.unpack(record)[3].rstrip(b'\0').decode()
+
+    def delete(self, key):
+        """
+        Drop a key from the index so it is no longer readable.
+        Deletes are not logged, so a restarted node reads the key again.
+
+        Returns:
+            bool: True if the key was present, False otherwise.
+        """
+        return self._index.pop(str(key).encode(), None) is not None
+
+    def snapshot(self):
+        """
+        Capture the log for reading: the sealed segments are immutable, so only their paths and
+        record counts are taken, and just the active segment's records are copied.
+
+        Returns:
+            tuple: (sealed segments as (path, record count) pairs, raw records of the active segment);
+            read them in log order with `read_snapshot`.
+        """
+        return tuple(self._sealed), self._buf[:self._count * RECORD_SIZE]
+
+    def read_range(self, start, stop):
+        """
+        Read the raw records for log indices `start` up to (not including) `stop`. The log is never
+        compacted and indices start at 1, so index i is the i-th record across the segments.
+
+        Returns:
+            bytes: The raw records in log order; fewer than requested if the log ends before `stop`.
+        """
+        first, end = (start - 1) * RECORD_SIZE, (stop - 1) * RECORD_SIZE  # Byte range across all segments
+        chunks = []
+        segment_start = 0
+        for path, count in self._sealed:
+            segment_end = segment_start + count * RECORD_SIZE
+            if first < segment_end and end > segment_start:
+                with open(path, 'rb') as f:
+                    f.seek(max(first - segment_start, 0))
+                    chunks.append(f.read(min(end, segment_end) - max(first, segment_start)))
+            segment_start = segment_end
+        active_end = segment_start + self._count * RECORD_SIZE
+        if end > segment_start and first < active_end:
+            chunks.append(self._buf[max(first - segment_start, 0):min(end, active_end) - segment_start])
+        return b''.join(chunks)
+
+    def _segment_path(self, segment):
+        return f"{self.path}.{segment}"
+
+    def _map_active(self, mode):
+        """
+        Map the next segment file as the active segment, creating it with `mode` 'w+b' or
+        reopening it with 'r+b', and index the records already in it.
+        The file is closed once mapped; the mapping keeps its own descriptor.
+        """
+        with open(self._segment_path(len(self._sealed)), mode) as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                # New, or left empty by a crash before it was sized
+                f.truncate(self.capacity * RECORD_SIZE)
+            self._buf = mmap.mmap(f.fileno(), 0)
+        self._count = self._scan(self._buf, len(self._sealed))
+
+    def _load_sealed(self, segment):
+        """
+        Index the records of a sealed segment left by a previous run, without mapping it.
+        """
+        with open(self._segment_path(segment), 'rb') as f:
+            count = self._scan(f.read(), segment)
+        self._sealed.append((self._segment_path(segment), count))
+
+    def _scan(self, raw, segment):
+        """
+        Index the records in `raw`. Records are written in order and log indices start at 1,
+        so the first zeroed record marks the end of the written part.
+
+        Returns:
+            int: The number of records found.
+        """
+        count = 0
+        for term, idx, key, _ in RECORD.iter_unpack(raw[:len(raw) - len(raw) % RECORD_SIZE]):
+            if idx == 0:
+                break
+            self._index[key.rstrip(b'\0')] = (segment, count * RECORD_SIZE)
+            count += 1
+            self._last = (term, idx)
+        self._total += count
+        return count
+
+    def _rotate(self):
+        """
+        Seal the full active segment on disk, unmap it and continue appending in a new one.
+        """
+        self.flush()
+        self._buf.close()
+        self._sealed.append((self._segment_path(len(self._sealed)), self._count))
+        self._map_active('w+b')
+
+
+def read_snapshot(snapshot):
+    """
+    Read a snapshot taken with `RaftLog.snapshot`, without holding the log's lock: sealed
+    segments are never written again.
+
+    Yields:
+        bytes: Raw records in log order, one chunk per segment; decode them with `decode_entries`.
+    """
+    sealed, active = snapshot
+    for path, count in sealed:
+        with open(path, 'rb') as f:
+            yield f.read(count * RECORD_SIZE)
+    yield active
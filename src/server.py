@@ -1,25 +1,98 @@
 from node import Node
-from node import FOLLOWER, LEADER
-from flask import Flask, request, jsonify
-import sys
+from node import ColorFormatter, FOLLOWER, LEADER
+from raft_log import decode_entries, read_snapshot
+from config import cfg
+from quart import Quart, abort, request
+from hypercorn.asyncio import serve
+from hypercorn.config import Config
+import async_utils
+import asyncio
+import httpx
 import logging
+import orjson
+import os
+import sys
+
+try:
+    import uvloop  # libuv-based event loop for faster RPC fan-out
+except ImportError:  # Not available on Windows
+    uvloop = None
+
+app = Quart(__name__)
+log = logging.getLogger("raft.server")
+
+# Marks requests a follower has already proxied, so they are never forwarded twice
+FORWARDED_HEADER = "X-Raft-Forwarded"
+
+
+def ojsonify(obj):
+    """
+    Serialize `obj` with orjson into a JSON response.
+    """
+    return app.response_class(orjson.dumps(obj), mimetype='application/json')
+
+
+async def read_json():
+    """
+    Parse the JSON body of the current request with orjson, answering 400 if it is not valid JSON.
+    """
+    try:
+        return orjson.loads(await request.get_data())
+    except orjson.JSONDecodeError:
+        abort(400)
+
+
+def valid_batch(payload):
+    """
+    Check that a batch payload is a non-empty list of entries that each carry a key and a value.
+    """
+    return (isinstance(payload, list) and len(payload) > 0
+            and all(isinstance(entry, dict) and "key" in entry and "value" in entry for entry in payload))
+
+
+async def forward_to_leader(method, message, url=None):
+    """
+    Proxy a client request to the cached leader over the pooled async client.
+
+    Args:
+        method (str): The HTTP method of the client request.
+        message (dict): The original JSON body of the client request.
+        url (str): The leader route to forward to; defaults to the leader's "/request" URL.
+
+    Returns:
+        dict or None: The leader's JSON reply, or None if there is no known leader, the request
+        was already forwarded once, or the leader could not be reached.
+    """
+    url = url or n.leader_request_url
+    if url is None or FORWARDED_HEADER in request.headers:
+        return None
+    try:
+        reply = await async_utils.client.request(
+            method, url, content=orjson.dumps(message),
+            headers={**async_utils.JSON_HEADERS, FORWARDED_HEADER: n.addr}, timeout=cfg.PROXY_TIMEOUT / 1000,
+        )
+        if reply.status_code == 200:
+            return orjson.loads(reply.content)
+    except httpx.HTTPError:
+        log.warning("[Server %s] Could not forward request to leader %s.", n.addr, n.leader)
+    return None
 
-app = Flask(__name__)
 
 @app.route("/request", methods=['DELETE'])
-def value_delete():
+async def value_delete():
     """
     Handle DELETE requests to remove a key-value pair from the Raft cluster.
 
     If the node is a LEADER:
         - Process the request using the node's `handle_delete` method.
     If the node is a FOLLOWER:
-        - Redirect the request to the current leader.
+        - Forward the request to the current leader, or redirect the client if that fails.
 
     Returns:
         JSON response indicating success or failure of the DELETE operation.
     """
-    payload = request.json["payload"]
+    message = await read_json()
+    payload = message["payload"]
     reply = {"code": 'fail'}
 
     if n.status == LEADER:
@@ -27,76 +100,136 @@ def value_delete():
         if result:
             reply = {"code": "success"}
     elif n.status == FOLLOWER:
+        forwarded = await forward_to_leader("DELETE", message)
+        if forwarded is not None:
+            return ojsonify(forwarded)
         # Redirect to the current leader
         payload["message"] = n.leader
         reply["payload"] = payload
-    return jsonify(reply)
+    return ojsonify(reply)
 
 
 @app.route("/show_log", methods=['GET'])
-def show_log():
+async def show_log():
     """
     Handle GET requests to output the current log of the node.
     
     Returns:
-        JSON response containing the log of the node.
+        JSON response containing the log of the node, streamed record by record.
     """
-    print(f"[Server {n.addr}] Showing current log.")
-    return jsonify({"log": n.log})
+    log.debug("[Server %s] Showing current log.", n.addr)
+
+    snapshot = n.log_snapshot()
+
+    async def stream():
+        yield b'{"log": ['
+        separator = b''
+        for raw in read_snapshot(snapshot):
+            for entry in decode_entries(raw):
+                yield separator + orjson.dumps(entry)
+                separator = b','
+        yield b']}'
+
+    return app.response_class(stream(), mimetype='application/json')
 
 @app.route("/request", methods=['GET'])
-def value_get():
+async def value_get():
     """
     Handle GET requests to retrieve the value of a key in the Raft cluster.
 
     If the node is a LEADER:
         - Process the request using the node's `handle_get` method.
     If the node is a FOLLOWER:
-        - Redirect the request to the current leader.
+        - Forward the request to the current leader, or redirect the client if that fails.
 
     Returns:
         JSON response containing the result of the GET operation or a redirection.
     """
-    payload = request.json["payload"]
+    message = await read_json()
+    payload = message["payload"]
     reply = {"code": 'fail', 'payload': payload}
     if n.status == LEADER:
         result = n.handle_get(payload)
         if result:
             reply = {"code": "success", "payload": result}
     elif n.status == FOLLOWER:
+        forwarded = await forward_to_leader("GET", message)
+        if forwarded is not None:
+            return ojsonify(forwarded)
         # Redirect to the current leader
         reply["payload"]["message"] = n.leader
-    return jsonify(reply)
+    return ojsonify(reply)
 
 @app.route("/request", methods=['PUT'])
-def value_put():
+async def value_put():
     """
     Handle PUT requests to store a key-value pair in the Raft cluster.
 
     If the node is a LEADER:
-        - Process the request using the node's `handle_put` method.
+        - Queue the request with the node's `submit_put` method.
     If the node is a FOLLOWER:
-        - Redirect the request to the current leader.
+        - Forward the request to the current leader, or redirect the client if that fails.
 
     Returns:
         JSON response indicating success or failure of the PUT operation.
     """
-    payload = request.json["payload"]
+    message = await read_json()
+    payload = message["payload"]
     reply = {"code": 'fail'}
 
     if n.status == LEADER:
-        result = n.handle_put(payload)
+        # Coalesced with concurrent PUTs into a single replication round
+        result = await asyncio.wrap_future(n.submit_put(payload))
         if result:
             reply = {"code": "success"}
     elif n.status == FOLLOWER:
+        forwarded = await forward_to_leader("PUT", message)
+        if forwarded is not None:
+            return ojsonify(forwarded)
         # Redirect to the current leader
         payload["message"] = n.leader
         reply["payload"] = payload
-    return jsonify(reply)
+    return ojsonify(reply)
+
+
+@app.route("/request_batch", methods=['PUT'])
+async def value_put_batch():
+    """
+    Handle PUT requests to store several key-value pairs in one replication round.
+
+    If the node is a LEADER:
+        - Process the whole batch using the node's `handle_put_batch` method.
+    If the node is a FOLLOWER:
+        - Forward the request to the current leader, or redirect the client if that fails.
+
+    A payload that is not a non-empty list of key-value entries fails without being replicated.
+
+    Returns:
+        JSON response indicating success or failure of the batched PUT operation.
+    """
+    message = await read_json()
+    payload = message.get("payload")
+    reply = {"code": 'fail'}
+    if not valid_batch(payload):
+        log.warning("[Server %s] Rejected malformed PUT batch: %s", n.addr, payload)
+        return ojsonify(reply)
+
+    if n.status == LEADER:
+        # handle_put_batch blocks until followers ack, so run it off the event loop
+        result = await asyncio.get_running_loop().run_in_executor(None, n.handle_put_batch, payload)
+        if result:
+            reply = {"code": "success"}
+    elif n.status == FOLLOWER:
+        forwarded = await forward_to_leader("PUT", message, n.leader_batch_url)
+        if forwarded is not None:
+            return ojsonify(forwarded)
+        # Redirect to the current leader
+        reply["payload"] = {"message": n.leader}
+    return ojsonify(reply)
 
 
 @app.route("/leader_down", methods=['POST'])
-def leader_down():
+async def leader_down():
     """
     Handle POST requests indicating the leader is stepping down.
 
@@ -105,15 +238,14 @@ def leader_down():
     Returns:
         JSON response indicating the status of the operation.
     """
-    msg = request.json
-    print(f"[Server {n.addr}] Leader {msg['addr']} is stepping down.")
-    n.status = FOLLOWER
-    n.init_timeout()
-    return jsonify({"status": "ok"})
+    msg = await read_json()
+    log.info("[Server %s] Leader %s is stepping down.", n.addr, msg['addr'])
+    await n.step_down()
+    return ojsonify({"status": "ok"})
 
 
 @app.route("/vote_req", methods=['POST'])
-def vote_req():
+async def vote_req():
     """
     Handle POST requests for vote requests in an election.
 
@@ -123,16 +255,17 @@ def vote_req():
     Returns:
         JSON response containing the vote decision and current term.
     """
-    term = request.json["term"]
-    commitIdx = request.json["commitIdx"]
-    staged = request.json["staged"]
-    choice, term = n.decide_vote(term, commitIdx, staged)
+    msg = await read_json()
+    term = msg["term"]
+    commitIdx = msg["commitIdx"]
+    staged = msg["staged"]
+    choice, term = await n.decide_vote(term, commitIdx, staged)
     message = {"choice": choice, "term": term}
-    return jsonify(message)
+    return ojsonify(message)
 
 
 @app.route("/heartbeat", methods=['POST'])
-def heartbeat():
+async def heartbeat():
     """
     Handle POST requests for heartbeat messages from the leader.
 
@@ -142,14 +275,10 @@ def heartbeat():
     Returns:
         JSON response containing the term and commit index.
     """
-    term, commitIdx = n.heartbeat_follower(request.json)
+    term, commitIdx = await n.heartbeat_follower(await read_json())
     message = {"term": term, "commitIdx": commitIdx}
-    return jsonify(message)
-
+    return ojsonify(message)
 
-# Disable Flask's default logging
-log = logging.getLogger('werkzeug')
-log.disabled = True
 
 if __name__ == "__main__":
     """
@@ -165,6 +294,14 @@ if __name__ == "__main__":
     Adds an endpoint for viewing the node's log.
     """
     if len(sys.argv) == 3:
+        # Node output goes through `logging`; set RAFT_LOG_LEVEL=DEBUG for per-heartbeat detail
+        # Configured on the "raft" logger only, so Hypercorn and httpx keep their own output
+        handler = logging.StreamHandler()
+        handler.setFormatter(ColorFormatter("%(message)s"))
+        raft_logger = logging.getLogger("raft")
+        raft_logger.setLevel(os.environ.get("RAFT_LOG_LEVEL", "INFO").upper())
+        raft_logger.addHandler(handler)
+
         index = int(sys.argv[1])
         ip_list_file = sys.argv[2]
         ip_list = []
@@ -178,19 +315,25 @@ if __name__ == "__main__":
         my_ip = ip_list.pop(index)
         http, host, port = my_ip.split(':')
 
-        # Initialize the Node with the IP list and its own IP
-        n = Node(ip_list, my_ip)
+        # One event loop serves HTTP requests and drives the node's RPC fan-out
+        loop = uvloop.new_event_loop() if uvloop else asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+
+        # Initialize the Node with the IP list, its own IP and the event loop
+        n = Node(ip_list, my_ip, loop)
 
-        # Start the Flask server
+        # Start the Quart server under Hypercorn
         print("Routes available:")
         print("- /request (GET/PUT/DELETE): Handle GET, PUT, and DELETE requests.")
+        print("- /request_batch (PUT): Store several key-value pairs in one replication round.")
         print("- /show_log (GET): Display the current log of the node.")
         print("- /leader_down (POST): Notify that the leader is stepping down.")
         print("- /vote_req (POST): Handle vote requests during elections.")
         print("- /heartbeat (POST): Handle heartbeat messages from the leader.")
 
-
-        app.run(host="127.0.0.1", port=int(port), debug=False)
+        config = Config()
+        config.bind = [f"127.0.0.1:{port}"]
+        loop.run_until_complete(serve(app, config))
     else:
         # Print usage instructions
         print("usage: python server.py <index> <ip_list_file>")